@@ -1,10 +1,14 @@
 import atexit
+import cProfile
 import glob
+import hmac
 import logging
 import os
+import random
 import sys
 import tempfile
 import time
+import tracemalloc
 import uuid
 from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
@@ -14,12 +18,15 @@ from threading import Lock
 import dotenv
 import openpyxl
 import redis
+from redis.backoff import ExponentialBackoff
+from redis.retry import Retry
 from PIL import Image
 from PyPDF2 import PdfReader
 from apscheduler.schedulers.background import BackgroundScheduler
 from celery import Celery
 from docx import Document
-from flask import Flask, render_template, jsonify, request
+from kombu.exceptions import OperationalError
+from flask import Flask, render_template, jsonify, request, abort
 from flask_caching import Cache
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -27,6 +34,9 @@ from flask_socketio import SocketIO
 from markitdown import MarkItDown
 from werkzeug.utils import send_file, secure_filename
 
+import audio_pipeline
+import section_index
+
 # 初始化环境变量
 # 获取打包后的资源路径
 def get_resource_path(relative_path):
@@ -46,21 +56,20 @@ app = Flask(__name__, template_folder=template_folder)
 # 线程池执行器
 executor = ThreadPoolExecutor(max_workers=4)
 
-# 配置限流
-limiter = Limiter(
-    app=app,
-    key_func=get_remote_address,
-    default_limits=["200 per day", "50 per hour"]
-)
-
 
 def get_env_variable(var_name, default_value=None):
     value = os.environ.get(var_name)
-    if not value and var_name in ['REDIS_HOST', 'CELERY_BROKER_URL']:
-        raise ValueError(f"Missing required environment variable: {var_name}")
     return value or default_value
 
 
+def get_redis_url():
+    """Redis 地址：REDIS_URL，其次 CELERY_BROKER_URL，最后兼容旧的 REDIS_HOST/REDIS_PORT"""
+    redis_url = get_env_variable('REDIS_URL', get_env_variable('CELERY_BROKER_URL'))
+    if not redis_url and get_env_variable('REDIS_HOST'):
+        redis_url = f"redis://{get_env_variable('REDIS_HOST')}:{get_env_variable('REDIS_PORT', '6379')}/0"
+    return redis_url
+
+
 # 应用配置
 app.config.update({
     'UPLOAD_FOLDER': get_env_variable('UPLOAD_FOLDER', get_resource_path('uploads/')),
@@ -69,6 +78,21 @@ app.config.update({
     'FILE_RETENTION_HOURS': int(get_env_variable('FILE_RETENTION_HOURS', '1')),
     'CONVERSION_TIMEOUT': int(get_env_variable('CONVERSION_TIMEOUT', '300')),
     'MAX_INITIAL_SIZE': int(get_env_variable('MAX_INITIAL_SIZE', '102400')),
+    'REDIS_URL': get_redis_url(),
+    'REDIS_MAX_CONNECTIONS': int(get_env_variable('REDIS_MAX_CONNECTIONS', '20')),
+    'REDIS_SOCKET_TIMEOUT': float(get_env_variable('REDIS_SOCKET_TIMEOUT', '5')),
+    'REDIS_HEALTH_CHECK_INTERVAL': int(get_env_variable('REDIS_HEALTH_CHECK_INTERVAL', '30')),
+    'REDIS_RETRY_ATTEMPTS': int(get_env_variable('REDIS_RETRY_ATTEMPTS', '3')),
+    'AUDIO_BACKEND': get_env_variable('AUDIO_BACKEND', 'speech_recognition'),
+    'AUDIO_SEGMENT_SECONDS': int(get_env_variable('AUDIO_SEGMENT_SECONDS', '60')),
+    'AUDIO_SEGMENT_OVERLAP': float(get_env_variable('AUDIO_SEGMENT_OVERLAP', '1.0')),
+    'AUDIO_TRANSCRIBE_WORKERS': int(get_env_variable('AUDIO_TRANSCRIBE_WORKERS', '4')),
+    'AUDIO_LANGUAGE': get_env_variable('AUDIO_LANGUAGE'),
+    'SECTION_RATE_LIMIT': get_env_variable('SECTION_RATE_LIMIT', '600 per minute'),
+    'ADMIN_TOKEN': get_env_variable('ADMIN_TOKEN', ''),
+    'PROFILING_ALLOW_REQUEST': get_env_variable('PROFILING_ALLOW_REQUEST', 'false').lower() in ('1', 'true', 'yes'),
+    'PROFILING_SAMPLE_RATE': float(get_env_variable('PROFILING_SAMPLE_RATE', '0')),
+    'PROFILING_TOP_ALLOCATIONS': int(get_env_variable('PROFILING_TOP_ALLOCATIONS', '25')),
     'CSP_POLICY': get_env_variable('CSP_POLICY', "default-src 'self'; script-src 'self' https://code.jquery.com https://cdn.socket.io https://cdnjs.cloudflare.com 'unsafe-inline'; style-src 'self' https://cdnjs.cloudflare.com 'unsafe-inline'; font-src 'self' https://cdnjs.cloudflare.com; connect-src 'self' ws: wss:"),
     'ALLOWED_MIME_TYPES': {
         'pdf': 'application/pdf',
@@ -160,35 +184,99 @@ for handler in logging.getLogger().handlers:
 socketio = SocketIO(app, async_mode='threading')
 
 
+# 共享 Redis 连接池（缓存、任务状态与限流共用）
+# 未配置 REDIS_URL / CELERY_BROKER_URL / REDIS_HOST 时不使用 Redis
+if get_env_variable('REDIS_HOST') and not get_env_variable('REDIS_URL', get_env_variable('CELERY_BROKER_URL')):
+    logging.warning("REDIS_HOST/REDIS_PORT are deprecated, please set REDIS_URL instead")
+
+if app.config['REDIS_URL']:
+    redis_pool = redis.BlockingConnectionPool.from_url(
+        app.config['REDIS_URL'],
+        max_connections=app.config['REDIS_MAX_CONNECTIONS'],
+        timeout=app.config['REDIS_SOCKET_TIMEOUT'],
+        socket_timeout=app.config['REDIS_SOCKET_TIMEOUT'],
+        socket_connect_timeout=app.config['REDIS_SOCKET_TIMEOUT'],
+        health_check_interval=app.config['REDIS_HEALTH_CHECK_INTERVAL'],
+        retry=Retry(ExponentialBackoff(cap=2, base=0.1), app.config['REDIS_RETRY_ATTEMPTS'])
+    )
+    redis_client = redis.Redis(connection_pool=redis_pool)
+else:
+    redis_pool = None
+    redis_client = None
+
+# Redis 实时健康状态，由定期检查更新，任务分发与缓存后端均以此为准
+redis_health = {'healthy': False, 'last_check': None}
+
+CACHE_CONFIGS = {
+    'redis': {
+        'CACHE_TYPE': 'RedisCache',
+        'CACHE_DEFAULT_TIMEOUT': 300,
+        'CACHE_REDIS_HOST': redis_client
+    },
+    'simple': {
+        'CACHE_TYPE': 'SimpleCache',
+        'CACHE_DEFAULT_TIMEOUT': 300
+    }
+}
+
+
 # Redis连接检查
 def is_redis_available():
+    """通过共享连接池检查 Redis（连接失败时按指数退避重试）"""
+    if redis_client is None:
+        return False
     try:
-        r = redis.StrictRedis(
-            host=get_env_variable('REDIS_HOST', 'localhost'),
-            port=int(get_env_variable('REDIS_PORT', '6379')),
-            db=0
-        )
-        return r.ping()
-    except (redis.ConnectionError, ValueError) as e:
+        return bool(redis_client.ping())
+    except (redis.ConnectionError, redis.TimeoutError) as e:
         logging.warning(f"Redis connection failed: {str(e)}")
         return False
 
 
+def check_redis_health():
+    """
+    定期健康检查：更新实时状态，状态变化时切换缓存后端
+    断开时释放失效连接，恢复后由连接池重新建立连接
+    """
+    healthy = is_redis_available()
+    changed = healthy != redis_health['healthy']
+    redis_health.update(healthy=healthy, last_check=time.time())
+    if not healthy:
+        redis_pool.disconnect()
+    if changed:
+        # 切换后，另一后端中的任务状态不可见
+        cache.init_app(app, config=CACHE_CONFIGS['redis' if healthy else 'simple'])
+        logging.warning(f"Redis is {'up' if healthy else 'down'}, switched cache to {'Redis' if healthy else 'SimpleCache'}")
+
+
 # 缓存和Celery初始化
-redis_available = is_redis_available()
-if redis_available:
-    app.config['CELERY_BROKER_URL'] = get_env_variable('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+redis_health.update(healthy=is_redis_available(), last_check=time.time())
+cache = Cache(app, config=CACHE_CONFIGS['redis' if redis_health['healthy'] else 'simple'])
+
+if redis_pool:
+    app.config['CELERY_BROKER_URL'] = os.environ.get('CELERY_BROKER_URL') or app.config['REDIS_URL']
     celery = Celery(app.name, broker=app.config['CELERY_BROKER_URL'])
-    cache = Cache(app, config={
-        'CACHE_TYPE': 'RedisCache',
-        'CACHE_DEFAULT_TIMEOUT': 300,
-        'CACHE_REDIS_URL': app.config['CELERY_BROKER_URL']
-    })
+    # Celery 使用 kombu 自身的连接池，此处限制其大小并启用健康检查
+    celery.conf.update(
+        broker_pool_limit=app.config['REDIS_MAX_CONNECTIONS'],
+        broker_connection_retry_on_startup=True,
+        broker_transport_options={'health_check_interval': app.config['REDIS_HEALTH_CHECK_INTERVAL']}
+    )
+    # Redis 不可用时限流自动回退到内存计数，恢复后切回 Redis
+    limiter_storage = {
+        'storage_uri': app.config['REDIS_URL'],
+        'storage_options': {'connection_pool': redis_pool},
+        'in_memory_fallback_enabled': True
+    }
 else:
-    cache = Cache(app, config={
-        'CACHE_TYPE': 'SimpleCache',
-        'CACHE_DEFAULT_TIMEOUT': 300
-    })
+    limiter_storage = {'storage_uri': 'memory://'}
+
+# 配置限流（Redis 可用时跨进程共享计数）
+limiter = Limiter(
+    app=app,
+    key_func=get_remote_address,
+    default_limits=["200 per day", "50 per hour"],
+    **limiter_storage
+)
 
 md = MarkItDown(enable_plugins=False)  # 可根据需要启用插件
 file_status_queue = Queue()
@@ -239,6 +327,20 @@ def allowed_file(filename):
     return ext in app.config['ALLOWED_MIME_TYPES']
 
 
+def is_mp3_frame_header(header):
+    """
+    MPEG 音频帧头：11 位同步字、版本（非保留值）、Layer III，
+    以及有效的比特率与采样率索引（覆盖 MPEG-1/2/2.5，含 CRC 与否）
+    """
+    if len(header) < 3 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return False
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    return version != 0b01 and layer == 0b01 and bitrate_index != 0x0F and sample_rate_index != 0x03
+
+
 def initial_validation(file):
     """内存中的初步验证"""
     try:
@@ -249,11 +351,19 @@ def initial_validation(file):
         if len(header) == 0:
             raise ValueError("Empty file")
 
+        # WAV: RIFF 容器，偏移 8 处为 WAVE 标识
+        if header.startswith(b'RIFF') and header[8:12] == b'WAVE':
+            return 'wav'
+        # 无 ID3 标签的 MP3 直接以帧头开始
+        if is_mp3_frame_header(header):
+            return 'mp3'
+
         valid_signatures = {
             b'%PDF-': 'pdf',
             b'\x89PNG': 'png',
             b'\xFF\xD8\xFF': 'jpg',
-            b'PK\x03\x04': ['docx', 'pptx', 'xlsx']
+            b'PK\x03\x04': ['docx', 'pptx', 'xlsx'],
+            b'ID3': 'mp3'  # 带 ID3v2 标签的 MP3
         }
 
         for sig, exts in valid_signatures.items():
@@ -267,6 +377,16 @@ def initial_validation(file):
         return None
 
 
+# libmagic 对部分格式返回的非标准 MIME 类型
+MIME_ALIASES = {
+    'audio/x-wav': 'audio/wav',
+    'audio/wave': 'audio/wav',
+    'audio/vnd.wave': 'audio/wav',
+    'audio/mp3': 'audio/mpeg',
+    'audio/x-mpeg': 'audio/mpeg'
+}
+
+
 def validate_file_type(file_path):
     """MIME 类型验证"""
     try:
@@ -274,6 +394,7 @@ def validate_file_type(file_path):
         mime = magic.Magic(mime=True)
         detected_mime = mime.from_file(file_path)
         logging.info(f"Detected MIME type for {os.path.basename(file_path)}: {detected_mime}")
+        detected_mime = MIME_ALIASES.get(detected_mime, detected_mime)
         return detected_mime in app.config['ALLOWED_MIME_TYPES'].values()
     except ImportError:
         logging.warning("python-magic not available, using extension validation only")
@@ -351,7 +472,182 @@ def cleanup_file(file_path):
         logging.error(f"Cleanup failed: {str(e)}", extra={'path': os.path.basename(file_path)})
 
 
-def handle_conversion(file_path, unique_id, original_filename, llm_api_key=None, llm_model='gpt-4o'):
+# 性能剖析（按需开启）
+PROFILE_STAGES = ('validation', 'conversion')
+PROFILE_ARTIFACTS = ('prof', 'alloc.txt')
+# 同一时间只剖析一个阶段，避免多个会话争用 cProfile 并互相重置 tracemalloc 峰值；
+# tracemalloc 仍会记录进程内所有线程的分配（包括其他并发任务），且追踪期间所有任务都会变慢
+profiling_slot = Lock()
+
+
+def is_admin_request():
+    """校验管理员令牌（未配置 ADMIN_TOKEN 时始终拒绝）"""
+    admin_token = app.config['ADMIN_TOKEN']
+    provided = request.headers.get('X-Admin-Token', '')
+    return bool(admin_token) and hmac.compare_digest(provided, admin_token)
+
+
+def should_profile_request():
+    """决定当前上传是否开启剖析：管理员请求头、请求参数或采样率"""
+    if request.headers.get('X-Profile-Job') == '1' and is_admin_request():
+        return True
+    if app.config['PROFILING_ALLOW_REQUEST'] and request.form.get('profile') == '1':
+        return True
+    sample_rate = app.config['PROFILING_SAMPLE_RATE']
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+def get_profile_artifact_path(unique_id, stage, artifact):
+    """剖析结果与转换结果存放在同一目录"""
+    return os.path.join(app.config['OUTPUT_FOLDER'], f"{unique_id}.{stage}.{artifact}")
+
+
+@contextmanager
+def profiling_session(unique_id, stage, enabled):
+    """
+    CPU（cProfile）与内存（tracemalloc）剖析上下文管理器
+    未开启时直接放行，不引入任何额外开销；已有剖析进行中时跳过本次剖析
+    """
+    if not enabled:
+        yield
+        return
+
+    if not profiling_slot.acquire(blocking=False):
+        logging.warning(f"Profiling skipped for {unique_id} ({stage}): another profile is in progress")
+        yield
+        return
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    start_snapshot = tracemalloc.take_snapshot()
+    start_memory, _ = tracemalloc.get_traced_memory()
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # 其他剖析工具（如外部调试器）已处于活动状态
+        logging.warning(f"CPU profiler unavailable for {stage}: {str(e)}")
+        profiler = None
+
+    try:
+        yield
+    finally:
+        try:
+            if profiler:
+                profiler.disable()
+            snapshot = tracemalloc.take_snapshot()
+            end_memory, peak = tracemalloc.get_traced_memory()
+        finally:
+            # 仅停止本会话启动的追踪（例如保留 PYTHONTRACEMALLOC 开启的追踪）
+            if started_tracing:
+                tracemalloc.stop()
+            profiling_slot.release()
+
+        try:
+            if profiler:
+                profiler.dump_stats(get_profile_artifact_path(unique_id, stage, 'prof'))
+            top_stats = snapshot.compare_to(start_snapshot, 'lineno')[:app.config['PROFILING_TOP_ALLOCATIONS']]
+            with open(get_profile_artifact_path(unique_id, stage, 'alloc.txt'), 'w', encoding='utf-8') as f:
+                f.write(f"Stage: {stage}\n")
+                f.write(f"Peak memory growth: {(peak - start_memory) / 1024:.1f} KiB\n")
+                f.write(f"Retained memory growth: {(end_memory - start_memory) / 1024:.1f} KiB\n\n")
+                for stat in top_stats:
+                    f.write(f"{stat}\n")
+            logging.info(f"Profile captured for {unique_id} ({stage})")
+        except Exception as e:
+            logging.error(f"Failed to write profile artifacts: {str(e)}")
+
+
+# 音频分段转录
+AUDIO_EXTENSIONS = ('wav', 'mp3')
+audio_backend = None
+audio_backend_lock = Lock()
+
+
+def get_audio_backend():
+    """延迟创建转录后端（本地模型只加载一次）"""
+    global audio_backend
+    with audio_backend_lock:
+        if audio_backend is None:
+            audio_backend = audio_pipeline.get_backend(
+                app.config['AUDIO_BACKEND'],
+                num_workers=app.config['AUDIO_TRANSCRIBE_WORKERS']
+            )
+            logging.info(f"Using audio transcription backend: {app.config['AUDIO_BACKEND']}")
+        return audio_backend
+
+
+def transcribe_audio_file(file_path, unique_id):
+    """分段并行转录音频，并按片段推送进度"""
+    def report_progress(completed, total, segment):
+        socketio.emit('processing_progress', {
+            'unique_id': unique_id,
+            'current': completed,
+            'total': total,
+            'message': f"Transcribed segment {completed}/{total} "
+                       f"({audio_pipeline.format_timestamp(segment['start'])} - "
+                       f"{audio_pipeline.format_timestamp(segment['end'])})"
+        })
+
+    return audio_pipeline.transcribe_audio(
+        file_path,
+        get_audio_backend(),
+        segment_seconds=app.config['AUDIO_SEGMENT_SECONDS'],
+        overlap_seconds=app.config['AUDIO_SEGMENT_OVERLAP'],
+        max_workers=app.config['AUDIO_TRANSCRIBE_WORKERS'],
+        language=app.config['AUDIO_LANGUAGE'],
+        progress_callback=report_progress
+    )
+
+
+def handle_conversion(file_path, unique_id, original_filename, llm_api_key=None, llm_model='gpt-4o', profile=False):
+    """处理文件转换（可选剖析）"""
+    with profiling_session(unique_id, 'conversion', profile):
+        run_conversion(file_path, unique_id, original_filename, llm_api_key, llm_model)
+
+
+def convert_with_markitdown(file_path, unique_id, llm_api_key=None, llm_model='gpt-4o'):
+    """使用 MarkItDown 转换文件，返回 Markdown 文本"""
+    # 根据 LLM 配置动态创建 MarkItDown 实例
+    if llm_api_key:
+        try:
+            from openai import OpenAI
+            llm_client = OpenAI(api_key=llm_api_key)
+            md_instance = MarkItDown(
+                enable_plugins=False,
+                llm_client=llm_client,
+                llm_model=llm_model
+            )
+            logging.info(f"Using LLM model: {llm_model}")
+        except Exception as e:
+            logging.warning(f"Failed to initialize LLM client: {str(e)}, using default MarkItDown")
+            md_instance = MarkItDown(enable_plugins=False)
+    else:
+        md_instance = MarkItDown(enable_plugins=False)
+
+    # 执行转换并发送进度
+    socketio.emit('processing_progress', {
+        'unique_id': unique_id,
+        'current': 1,
+        'total': 3,
+        'message': 'Analyzing file structure...'
+    })
+
+    result = md_instance.convert(file_path)
+
+    socketio.emit('processing_progress', {
+        'unique_id': unique_id,
+        'current': 2,
+        'total': 3,
+        'message': 'Generating markdown output...'
+    })
+    return result.text_content
+
+
+def run_conversion(file_path, unique_id, original_filename, llm_api_key=None, llm_model='gpt-4o'):
     """处理文件转换的核心逻辑"""
     try:
         logging.info(f"Starting conversion: {os.path.basename(file_path)}")
@@ -363,44 +659,23 @@ def handle_conversion(file_path, unique_id, original_filename, llm_api_key=None,
             'message': 'Starting file conversion...'
         })
 
-        # 根据 LLM 配置动态创建 MarkItDown 实例
-        if llm_api_key:
-            try:
-                from openai import OpenAI
-                llm_client = OpenAI(api_key=llm_api_key)
-                md_instance = MarkItDown(
-                    enable_plugins=False,
-                    llm_client=llm_client,
-                    llm_model=llm_model
-                )
-                logging.info(f"Using LLM model: {llm_model}")
-            except Exception as e:
-                logging.warning(f"Failed to initialize LLM client: {str(e)}, using default MarkItDown")
-                md_instance = MarkItDown(enable_plugins=False)
+        ext = file_path.rsplit('.', 1)[-1].lower()
+        if ext in AUDIO_EXTENSIONS and app.config['AUDIO_BACKEND'] != 'markitdown':
+            text_content = transcribe_audio_file(file_path, unique_id)
         else:
-            md_instance = MarkItDown(enable_plugins=False)
+            text_content = convert_with_markitdown(file_path, unique_id, llm_api_key, llm_model)
 
-        # 执行转换并发送进度
-        socketio.emit('processing_progress', {
-            'unique_id': unique_id,
-            'current': 1,
-            'total': 3,
-            'message': 'Analyzing file structure...'
-        })
-        
-        result = md_instance.convert(file_path)
-        
-        socketio.emit('processing_progress', {
-            'unique_id': unique_id,
-            'current': 2,
-            'total': 3,
-            'message': 'Generating markdown output...'
-        })
-        
         output_path = os.path.join(app.config['OUTPUT_FOLDER'], f"{unique_id}.md")
+        output_data = text_content.encode('utf-8')
+
+        with open(output_path, 'wb') as f:
+            f.write(output_data)
 
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(result.text_content)
+        # 构建标题索引，供按章节读取（失败时在首次访问时重建）
+        try:
+            section_index.write_section_index(output_path, output_data)
+        except Exception as e:
+            logging.warning(f"Section index build failed: {str(e)}")
         
         socketio.emit('processing_progress', {
             'unique_id': unique_id,
@@ -456,7 +731,7 @@ def handle_conversion(file_path, unique_id, original_filename, llm_api_key=None,
         cleanup_file(file_path)
 
 
-if redis_available:
+if redis_pool:
     @celery.task(bind=True)
     def async_conversion_task(self, file_path, unique_id):
         """Celery 异步任务"""
@@ -466,8 +741,9 @@ if redis_available:
             llm_api_key = cache_data.get('llm_api_key') if cache_data else None
             llm_model = cache_data.get('llm_model', 'gpt-4o') if cache_data else 'gpt-4o'
             original_filename = cache_data.get('original_name', 'Unknown') if cache_data else 'Unknown'
+            profile = cache_data.get('profile', False) if cache_data else False
             
-            handle_conversion(file_path, unique_id, original_filename, llm_api_key, llm_model)
+            handle_conversion(file_path, unique_id, original_filename, llm_api_key, llm_model, profile)
             return {'status': 'completed'}
         except Exception as e:
             cache.set(unique_id, {
@@ -479,6 +755,17 @@ if redis_available:
             raise
 
 
+def dispatch_conversion(file_path, unique_id, original_filename, llm_api_key, llm_model, profile):
+    """Redis 健康时交给 Celery，否则（或投递失败时）在本地线程池执行"""
+    if redis_health['healthy']:
+        try:
+            async_conversion_task.delay(file_path, unique_id)
+            return
+        except OperationalError as e:
+            logging.warning(f"Celery dispatch failed, falling back to local executor: {str(e)}")
+    executor.submit(handle_conversion, file_path, unique_id, original_filename, llm_api_key, llm_model, profile)
+
+
 @app.after_request
 def add_security_headers(response):
     """添加安全头，包括 CSP"""
@@ -526,6 +813,152 @@ def download_file(unique_id):
         return jsonify(status='error', message='File download failed'), 500
 
 
+def get_completed_output(unique_id):
+    """返回已完成任务的输出路径，不存在时返回 None"""
+    file_data = cache.get(unique_id)
+    if not file_data or file_data['status'] != 'completed' or not os.path.exists(file_data['path']):
+        return None
+    return file_data['path']
+
+
+def get_int_arg(name, default=None):
+    """读取整数查询参数，格式错误时抛出 ValueError"""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    return int(value)
+
+
+@app.route('/download/<uuid:unique_id>/outline')
+@limiter.limit(lambda: app.config['SECTION_RATE_LIMIT'])
+def download_outline(unique_id):
+    """返回文档标题大纲及各章节字节区间"""
+    unique_id = str(unique_id)
+    output_path = get_completed_output(unique_id)
+    if not output_path:
+        return jsonify(status='error', message='File not found'), 404
+
+    try:
+        index = section_index.load_section_index(output_path)
+    except Exception as e:
+        logging.error(f"Outline load failed: {str(e)}")
+        return jsonify(status='error', message='Outline unavailable'), 500
+
+    return jsonify(status='success', unique_id=unique_id, size=index['size'], sections=index['sections'])
+
+
+@app.route('/download/<uuid:unique_id>/section')
+@limiter.limit(lambda: app.config['SECTION_RATE_LIMIT'])
+def download_section(unique_id):
+    """按标题路径（path=章/节）或章节编号（id=）读取单个章节"""
+    unique_id = str(unique_id)
+    output_path = get_completed_output(unique_id)
+    if not output_path:
+        return jsonify(status='error', message='File not found'), 404
+
+    try:
+        index = section_index.load_section_index(output_path)
+    except Exception as e:
+        logging.error(f"Outline load failed: {str(e)}")
+        return jsonify(status='error', message='Outline unavailable'), 500
+
+    try:
+        section_id = get_int_arg('id')
+    except ValueError:
+        return jsonify(status='error', message='Invalid section id'), 400
+    if 'path' not in request.args and section_id is None:
+        return jsonify(status='error', message='Missing section path or id'), 400
+
+    section = None
+    if 'path' in request.args:
+        section = section_index.find_section(index, request.args['path'])
+    elif section_id is not None and 0 <= section_id < len(index['sections']):
+        section = index['sections'][section_id]
+    if not section:
+        return jsonify(status='error', message='Section not found'), 404
+
+    data = section_index.read_byte_range(output_path, section['start'], section['end'])
+    return app.response_class(data, mimetype='text/markdown', headers={
+        'X-Section-Start': str(section['start']),
+        'X-Section-End': str(section['end'])
+    })
+
+
+@app.route('/download/<uuid:unique_id>/range')
+@limiter.limit(lambda: app.config['SECTION_RATE_LIMIT'])
+def download_range(unique_id):
+    """读取输出文件的字节区间 [start, end)"""
+    unique_id = str(unique_id)
+    output_path = get_completed_output(unique_id)
+    if not output_path:
+        return jsonify(status='error', message='File not found'), 404
+
+    size = os.path.getsize(output_path)
+    try:
+        start = get_int_arg('start', 0)
+        end = get_int_arg('end', size)
+    except ValueError:
+        return jsonify(status='error', message='Invalid byte range'), 400
+    if start < 0 or end < start or start > size:
+        return jsonify(status='error', message='Invalid byte range'), 416
+
+    data = section_index.read_byte_range(output_path, start, min(end, size))
+    return app.response_class(data, mimetype='text/markdown', headers={
+        'X-Range-Start': str(start),
+        'X-Range-End': str(min(end, size)),
+        'X-Total-Size': str(size)
+    })
+
+
+@app.route('/admin/profile/<uuid:unique_id>')
+def list_profile_artifacts(unique_id):
+    """列出任务的剖析结果（仅管理员）"""
+    if not is_admin_request():
+        abort(404)
+
+    unique_id = str(unique_id)
+    artifacts = [
+        f"{stage}.{artifact}"
+        for stage in PROFILE_STAGES
+        for artifact in PROFILE_ARTIFACTS
+        if os.path.exists(get_profile_artifact_path(unique_id, stage, artifact))
+    ]
+    if not artifacts:
+        return jsonify(status='error', message='Profile not found'), 404
+
+    return jsonify(status='success', unique_id=unique_id, artifacts=[
+        {'name': name, 'url': f"/admin/profile/{unique_id}/{name}"} for name in artifacts
+    ])
+
+
+@app.route('/admin/profile/<uuid:unique_id>/<name>')
+def download_profile_artifact(unique_id, name):
+    """下载剖析结果（仅管理员）"""
+    if not is_admin_request():
+        abort(404)
+
+    stage, _, artifact = name.partition('.')
+    if stage not in PROFILE_STAGES or artifact not in PROFILE_ARTIFACTS:
+        return jsonify(status='error', message='Profile not found'), 404
+
+    unique_id = str(unique_id)
+    artifact_path = get_profile_artifact_path(unique_id, stage, artifact)
+    if not os.path.exists(artifact_path):
+        return jsonify(status='error', message='Profile not found'), 404
+
+    try:
+        return send_file(
+            artifact_path,
+            mimetype='text/plain' if artifact == 'alloc.txt' else 'application/octet-stream',
+            as_attachment=True,
+            download_name=f"{unique_id}.{stage}.{artifact}",
+            environ=request.environ
+        )
+    except Exception as e:
+        logging.error(f"Profile download failed: {str(e)}")
+        return jsonify(status='error', message='Profile download failed'), 500
+
+
 @app.route('/upload', methods=['POST'])
 @limiter.limit("5/minute")
 def upload_file():
@@ -552,13 +985,17 @@ def upload_file():
         return jsonify(status='error', message='Invalid file signature'), 400
 
     unique_id = str(uuid.uuid4())
+    profile = should_profile_request()
     temp_filename = f"{unique_id}.{valid_ext if isinstance(valid_ext, str) else file.filename.rsplit('.', 1)[1].lower()}"
     temp_path = os.path.join(app.config['UPLOAD_FOLDER'], temp_filename)
 
     try:
         file.save(temp_path)
 
-        if not is_file_content_valid(temp_path):
+        with profiling_session(unique_id, 'validation', profile):
+            content_valid = is_file_content_valid(temp_path)
+
+        if not content_valid:
             # 获取更详细的错误信息（从日志中）
             error_detail = "文件内容验证失败。请确保文件格式正确且未损坏。"
             logging.error(f"Validation failed for uploaded file: {os.path.basename(temp_path)}")
@@ -576,13 +1013,11 @@ def upload_file():
             'timestamp': time.time(),
             'original_name': original_filename,
             'llm_api_key': llm_api_key,
-            'llm_model': llm_model
+            'llm_model': llm_model,
+            'profile': profile
         })
 
-        if redis_available:
-            async_conversion_task.delay(temp_path, unique_id)
-        else:
-            executor.submit(handle_conversion, temp_path, unique_id, original_filename, llm_api_key, llm_model)
+        dispatch_conversion(temp_path, unique_id, original_filename, llm_api_key, llm_model, profile)
 
         return jsonify(status='success', unique_id=unique_id)
 
@@ -610,6 +1045,7 @@ def process_youtube_url(youtube_url):
         
         unique_id = str(uuid.uuid4())
         original_filename = f"youtube_{unique_id[:8]}.txt"
+        profile = should_profile_request()
         
         # 获取 LLM 配置
         llm_api_key = request.form.get('llm_api_key', '').strip()
@@ -627,15 +1063,13 @@ def process_youtube_url(youtube_url):
             'original_name': original_filename,
             'llm_api_key': llm_api_key,
             'llm_model': llm_model,
-            'is_youtube': True
+            'is_youtube': True,
+            'profile': profile
         })
         
         logging.info(f"Processing YouTube URL: {youtube_url}")
         
-        if redis_available:
-            async_conversion_task.delay(temp_path, unique_id)
-        else:
-            executor.submit(handle_conversion, temp_path, unique_id, original_filename, llm_api_key, llm_model)
+        dispatch_conversion(temp_path, unique_id, original_filename, llm_api_key, llm_model, profile)
         
         return jsonify(status='success', unique_id=unique_id)
     
@@ -684,6 +1118,8 @@ def clean_up_files():
 
 
 scheduler.add_job(clean_up_files, 'interval', hours=1)
+if redis_pool:
+    scheduler.add_job(check_redis_health, 'interval', seconds=app.config['REDIS_HEALTH_CHECK_INTERVAL'])
 scheduler.start()
 
 
@@ -692,6 +1128,8 @@ def shutdown():
     try:
         scheduler.shutdown()
         executor.shutdown(wait=True)
+        if redis_pool:
+            redis_pool.disconnect()
         logging.info("Service shutdown completed")
     except Exception as e:
         logging.error(f"Shutdown error: {str(e)}")
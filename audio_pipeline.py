@@ -0,0 +1,304 @@
+"""
+音频分段转录流水线
+在静音处切分长录音（相邻片段带少量重叠），并行转录各片段后按时间戳合并
+
+转录后端可插拔：
+    stub                - 离线占位后端，不依赖任何模型或网络，用于测试
+    speech_recognition  - 与 MarkItDown 默认音频转换器一致（Google Web Speech）
+    faster_whisper      - 本地 Whisper 模型（需安装 faster-whisper）
+"""
+import io
+import logging
+import os
+import re
+import string
+import wave
+import zlib
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+TARGET_SAMPLE_RATE = 16000
+
+
+class PcmAudio:
+    """单声道 16 位 PCM 音频"""
+
+    def __init__(self, samples, sample_rate):
+        self.samples = samples
+        self.sample_rate = sample_rate
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    def to_wav_bytes(self, start, end):
+        """导出 [start, end) 采样区间为 WAV 字节"""
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(self.samples[start:end].tobytes())
+        return buffer.getvalue()
+
+
+def load_audio(file_path):
+    """读取音频并转换为单声道 16 位 PCM（优先使用 pydub，否则仅支持 16 位 WAV）"""
+    try:
+        from pydub import AudioSegment
+        segment = AudioSegment.from_file(file_path)
+        segment = segment.set_channels(1).set_frame_rate(TARGET_SAMPLE_RATE).set_sample_width(2)
+        samples = array('h')
+        samples.frombytes(segment.raw_data)
+        return PcmAudio(samples, TARGET_SAMPLE_RATE)
+    except ImportError:
+        logging.warning("pydub not available, falling back to wave module")
+
+    if not file_path.lower().endswith('.wav'):
+        raise ValueError("pydub is required to decode non-WAV audio")
+
+    with wave.open(file_path, 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError("Only 16-bit WAV is supported without pydub")
+        channels = wav.getnchannels()
+        sample_rate = wav.getframerate()
+        samples = array('h')
+        samples.frombytes(wav.readframes(wav.getnframes()))
+    if channels > 1:
+        # 取第一个声道
+        samples = samples[::channels]
+    return PcmAudio(samples, sample_rate)
+
+
+def _window_energy(samples, start, size):
+    """窗口内平均能量（隔点采样以降低开销）"""
+    window = samples[start:start + size:4]
+    if not window:
+        return 0
+    return sum(s * s for s in window) / len(window)
+
+
+def find_split_points(audio, segment_seconds, search_seconds=5.0, window_ms=100):
+    """
+    在每个目标切分点附近搜索能量最低的窗口作为切分位置
+    只分析切分点前后的 search_seconds，避免扫描整段录音
+    """
+    rate = audio.sample_rate
+    total = len(audio.samples)
+    segment_size = int(segment_seconds * rate)
+    if segment_size <= 0:
+        raise ValueError(f"Segment length must be positive: {segment_seconds}")
+    search_size = min(int(search_seconds * rate), segment_size // 2)
+    window_size = max(1, int(rate * window_ms / 1000))
+    step = max(1, window_size // 2)
+
+    split_points = []
+    last_point = 0
+    while total - last_point > segment_size + search_size:
+        target = last_point + segment_size
+        best_point, best_energy = target, None
+        for start in range(target - search_size, target + search_size, step):
+            energy = _window_energy(audio.samples, start, window_size)
+            if best_energy is None or energy < best_energy:
+                best_point, best_energy = start + window_size // 2, energy
+        if best_point <= last_point:
+            best_point = target
+        split_points.append(best_point)
+        last_point = best_point
+    return split_points
+
+
+def build_segments(audio, split_points, overlap_seconds=1.0):
+    """根据切分点生成片段，相邻片段两侧各扩展 overlap_seconds"""
+    if overlap_seconds < 0:
+        raise ValueError(f"Segment overlap must not be negative: {overlap_seconds}")
+    rate = audio.sample_rate
+    total = len(audio.samples)
+    overlap = int(overlap_seconds * rate)
+    bounds = [0] + split_points + [total]
+
+    segments = []
+    for index, (start, end) in enumerate(zip(bounds, bounds[1:])):
+        segments.append({
+            'index': index,
+            'start': start / rate,
+            'end': end / rate,
+            'sample_start': max(0, start - overlap),
+            'sample_end': min(total, end + overlap)
+        })
+    return segments
+
+
+class TranscriptionBackend:
+    """转录后端接口，num_workers 为并行转录的片段数"""
+
+    name = None
+
+    def __init__(self, num_workers=1):
+        self.num_workers = num_workers
+
+    def transcribe(self, wav_bytes, language=None):
+        """转录一段 WAV 音频，返回文本（无语音时返回空字符串）"""
+        raise NotImplementedError
+
+
+class StubTranscriptionBackend(TranscriptionBackend):
+    """离线占位后端，返回描述片段的确定性文本"""
+
+    name = 'stub'
+
+    def transcribe(self, wav_bytes, language=None):
+        with wave.open(io.BytesIO(wav_bytes), 'rb') as wav:
+            duration = wav.getnframes() / wav.getframerate()
+        return f"[stub transcript: {duration:.1f}s, crc {zlib.crc32(wav_bytes):08x}]"
+
+
+class SpeechRecognitionBackend(TranscriptionBackend):
+    """speech_recognition 后端（与 MarkItDown 音频转换器相同的识别服务）"""
+
+    name = 'speech_recognition'
+
+    def __init__(self, num_workers=1):
+        super().__init__(num_workers)
+        import speech_recognition as sr
+        self._sr = sr
+
+    def transcribe(self, wav_bytes, language=None):
+        recognizer = self._sr.Recognizer()
+        with self._sr.AudioFile(io.BytesIO(wav_bytes)) as source:
+            audio_data = recognizer.record(source)
+        try:
+            return recognizer.recognize_google(audio_data, language=language or 'en-US').strip()
+        except self._sr.UnknownValueError:
+            return ''
+
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """
+    本地 Whisper 后端（faster-whisper），模型在各线程间共享
+    num_workers 决定模型可同时执行的 transcribe() 调用数，为 1 时并发调用会依次执行
+    """
+
+    name = 'faster_whisper'
+
+    def __init__(self, num_workers=1):
+        super().__init__(num_workers)
+        from faster_whisper import WhisperModel
+        self._model = WhisperModel(
+            os.environ.get('WHISPER_MODEL', 'base'),
+            device=os.environ.get('WHISPER_DEVICE', 'auto'),
+            compute_type=os.environ.get('WHISPER_COMPUTE_TYPE', 'default'),
+            num_workers=num_workers
+        )
+
+    def transcribe(self, wav_bytes, language=None):
+        segments, _ = self._model.transcribe(io.BytesIO(wav_bytes), language=language)
+        return ' '.join(segment.text.strip() for segment in segments).strip()
+
+
+TRANSCRIPTION_BACKENDS = {
+    backend.name: backend
+    for backend in (StubTranscriptionBackend, SpeechRecognitionBackend, FasterWhisperBackend)
+}
+
+
+def register_backend(backend_class):
+    """注册自定义转录后端"""
+    TRANSCRIPTION_BACKENDS[backend_class.name] = backend_class
+    return backend_class
+
+
+def get_backend(name, **options):
+    """按名称创建转录后端，options 传给后端构造函数（如 num_workers）"""
+    if name not in TRANSCRIPTION_BACKENDS:
+        raise ValueError(f"Unknown transcription backend: {name}")
+    return TRANSCRIPTION_BACKENDS[name](**options)
+
+
+CJK_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]')
+OVERLAP_PUNCTUATION = string.punctuation + string.whitespace + '，。！？、；：“”‘’（）《》…—'
+
+
+def _normalize_word(word):
+    return word.strip(string.punctuation).lower()
+
+
+def _trim_overlap_chars(previous, current, min_chars=2, max_chars=50):
+    """按字符去除重叠（中日韩文本没有空格分词），忽略两侧标点"""
+    tail = previous.rstrip(OVERLAP_PUNCTUATION)
+    head = current.lstrip(OVERLAP_PUNCTUATION)
+    limit = min(max_chars, len(tail), len(head))
+    for size in range(limit, min_chars - 1, -1):
+        if tail[-size:] == head[:size]:
+            return head[size:].lstrip(OVERLAP_PUNCTUATION)
+    return current
+
+
+def _trim_overlap(previous, current, min_words=2, max_words=20):
+    """
+    去除与上一片段结尾重复的开头词语（由片段重叠导致）
+    至少 min_words 个连续词语相同才视为重叠，避免误删单个常见词；
+    含中日韩文字的文本按字符匹配
+    """
+    if CJK_PATTERN.search(previous) and CJK_PATTERN.search(current):
+        return _trim_overlap_chars(previous, current)
+
+    previous_words = [_normalize_word(w) for w in previous.split()]
+    current_words = current.split()
+    normalized = [_normalize_word(w) for w in current_words]
+    limit = min(max_words, len(previous_words), len(current_words))
+    for size in range(limit, min_words - 1, -1):
+        if previous_words[-size:] == normalized[:size]:
+            return ' '.join(current_words[size:])
+    return current
+
+
+def format_timestamp(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def merge_transcripts(segments):
+    """按时间顺序合并片段转录结果，生成带时间戳的 Markdown"""
+    lines = ['### Audio Transcript:', '']
+    previous = ''
+    for segment in sorted(segments, key=lambda s: s['index']):
+        text = segment.get('text', '')
+        if previous:
+            text = _trim_overlap(previous, text)
+        if text:
+            lines.append(f"**[{format_timestamp(segment['start'])} - {format_timestamp(segment['end'])}]** {text}")
+            lines.append('')
+        previous = segment.get('text', '') or previous
+    return '\n'.join(lines)
+
+
+def transcribe_audio(file_path, backend, segment_seconds=60, overlap_seconds=1.0,
+                     max_workers=4, language=None, progress_callback=None):
+    """
+    分段并行转录音频文件
+    progress_callback(completed, total, segment) 在每个片段完成后调用
+    """
+    audio = load_audio(file_path)
+    split_points = find_split_points(audio, segment_seconds)
+    segments = build_segments(audio, split_points, overlap_seconds)
+    logging.info(f"Audio split into {len(segments)} segments ({audio.duration:.1f}s)")
+
+    def transcribe_segment(segment):
+        wav_bytes = audio.to_wav_bytes(segment['sample_start'], segment['sample_end'])
+        segment['text'] = backend.transcribe(wav_bytes, language=language)
+        return segment
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(transcribe_segment, segment) for segment in segments]
+        try:
+            for completed, future in enumerate(as_completed(futures), start=1):
+                segment = future.result()
+                if progress_callback:
+                    progress_callback(completed, len(segments), segment)
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+
+    return merge_transcripts(segments)
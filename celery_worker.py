@@ -13,10 +13,10 @@ import sys
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app import app, celery, redis_available
+from app import app, celery, redis_health
 
 if __name__ == '__main__':
-    if not redis_available:
+    if not redis_health['healthy']:
         print("警告：Redis 不可用，Celery Worker 无法启动")
         print("请确保 Redis 服务正在运行")
         sys.exit(1)
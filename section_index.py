@@ -0,0 +1,124 @@
+"""
+Markdown 标题索引
+记录每个 ATX 标题（# ~ ######）所在章节的字节区间，支持按标题路径随机读取章节，
+读取时使用 mmap，无需加载或解析整个文件
+"""
+import json
+import mmap
+import os
+import re
+import tempfile
+
+INDEX_VERSION = 2
+HEADING_PATTERN = re.compile(r'^ {0,3}(#{1,6})[ \t]+(.+?)(?:[ \t]+#+)?[ \t]*$')
+# 代码围栏：最多缩进 3 个空格，至少 3 个相同的 ` 或 ~（` 围栏的信息串中不能再含 `）
+FENCE_OPEN_PATTERN = re.compile(rb'^ {0,3}(`{3,}(?=[^`]*$)|~{3,})')
+FENCE_CLOSE_PATTERN = re.compile(rb'^ {0,3}(`{3,}|~{3,})[ \t]*$')
+
+
+def build_section_index(data):
+    """
+    根据 UTF-8 编码的 Markdown 内容构建章节索引
+    章节区间从标题行开始，到下一个同级或更高级标题（或文件末尾）结束，包含所有子章节
+    """
+    sections = []
+    stack = []
+    offset = 0
+    fence = None  # 当前所在围栏的开始标记（字符重复），None 表示不在围栏内
+
+    for line in data.splitlines(keepends=True):
+        start = offset
+        offset += len(line)
+        content = line.rstrip(b'\r\n')
+
+        if fence:
+            # 只有同一字符、长度不少于开始标记的围栏才能结束代码块
+            match = FENCE_CLOSE_PATTERN.match(content)
+            if match and match.group(1)[:1] == fence[:1] and len(match.group(1)) >= len(fence):
+                fence = None
+            continue
+
+        match = FENCE_OPEN_PATTERN.match(content)
+        if match:
+            fence = match.group(1)
+            continue
+
+        # 缩进 4 个及以上空格的行是缩进代码块，HEADING_PATTERN 不会匹配
+        if not content.lstrip(b' ').startswith(b'#'):
+            continue
+
+        match = HEADING_PATTERN.match(content.decode('utf-8', errors='replace'))
+        if not match:
+            continue
+
+        level = len(match.group(1))
+        while stack and stack[-1]['level'] >= level:
+            stack.pop()['end'] = start
+
+        title = match.group(2).strip()
+        section = {
+            'id': len(sections),
+            'level': level,
+            'title': title,
+            'path': [s['title'] for s in stack] + [title],
+            'start': start,
+            'end': None
+        }
+        sections.append(section)
+        stack.append(section)
+
+    for section in stack:
+        section['end'] = offset
+
+    return {'version': INDEX_VERSION, 'size': offset, 'sections': sections}
+
+
+def get_index_path(markdown_path):
+    """索引文件与 Markdown 输出文件存放在一起"""
+    return f"{os.path.splitext(markdown_path)[0]}.index.json"
+
+
+def write_section_index(markdown_path, data):
+    """构建并保存索引（先写入同目录临时文件再原子替换，读取方不会读到半写入的索引）"""
+    index = build_section_index(data)
+    index_path = get_index_path(markdown_path)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(index_path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(temp_path, index_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return index
+
+
+def load_section_index(markdown_path):
+    """读取索引；索引缺失或与文件大小不一致时重新构建"""
+    index_path = get_index_path(markdown_path)
+    size = os.path.getsize(markdown_path)
+    if os.path.exists(index_path):
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') == INDEX_VERSION and index.get('size') == size:
+            return index
+
+    return write_section_index(markdown_path, read_byte_range(markdown_path, 0, size))
+
+
+def find_section(index, path):
+    """按标题路径（以 / 分隔）查找章节"""
+    for section in index['sections']:
+        if '/'.join(section['path']) == path:
+            return section
+    return None
+
+
+def read_byte_range(markdown_path, start, end):
+    """使用 mmap 读取 [start, end) 字节区间"""
+    with open(markdown_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm[start:end]
@@ -0,0 +1,27 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 测试环境：不连接 Redis，上传与输出目录使用临时目录（需在导入 app 之前设置）
+_test_root = tempfile.mkdtemp(prefix='file2md_test_')
+for _name in ('REDIS_URL', 'CELERY_BROKER_URL', 'REDIS_HOST', 'REDIS_PORT', 'ADMIN_TOKEN'):
+    os.environ[_name] = ''
+os.environ['UPLOAD_FOLDER'] = os.path.join(_test_root, 'uploads')
+os.environ['OUTPUT_FOLDER'] = os.path.join(_test_root, 'output')
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    """延迟导入 app，仅测试 audio_pipeline/section_index 时无需 Flask 等依赖"""
+    import app
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
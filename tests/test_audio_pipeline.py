@@ -0,0 +1,137 @@
+"""音频分段转录流水线测试（使用离线 stub 后端，不依赖网络）"""
+import math
+import sys
+import types
+import wave
+from array import array
+
+import pytest
+
+import audio_pipeline
+from audio_pipeline import PcmAudio
+
+RATE = 1000
+
+
+def make_audio(seconds, silent_seconds=()):
+    """生成正弦波音频，silent_seconds 中的秒为静音"""
+    samples = array('h')
+    for second in range(seconds):
+        amplitude = 0 if second in silent_seconds else 8000
+        samples.extend(int(amplitude * math.sin(2 * math.pi * 50 * i / RATE)) for i in range(RATE))
+    return PcmAudio(samples, RATE)
+
+
+def test_find_split_points_prefers_silence():
+    audio = make_audio(30, silent_seconds={12})
+    points = audio_pipeline.find_split_points(audio, segment_seconds=10, search_seconds=3)
+    assert 12 * RATE <= points[0] < 13 * RATE
+
+
+def test_find_split_points_short_audio_not_split():
+    audio = make_audio(5)
+    assert audio_pipeline.find_split_points(audio, segment_seconds=10) == []
+
+
+def test_find_split_points_always_advances():
+    audio = make_audio(40)
+    points = audio_pipeline.find_split_points(audio, segment_seconds=1, search_seconds=5)
+    assert points == sorted(set(points))
+    assert points[0] > 0
+
+
+@pytest.mark.parametrize('segment_seconds', [0, 0.0001, -1])
+def test_find_split_points_rejects_non_positive_segment(segment_seconds):
+    with pytest.raises(ValueError):
+        audio_pipeline.find_split_points(make_audio(5), segment_seconds=segment_seconds)
+
+
+def test_build_segments_overlap_and_bounds():
+    audio = make_audio(30)
+    segments = audio_pipeline.build_segments(audio, [10 * RATE, 20 * RATE], overlap_seconds=1)
+    assert [(s['start'], s['end']) for s in segments] == [(0, 10), (10, 20), (20, 30)]
+    assert segments[0]['sample_start'] == 0
+    assert segments[1]['sample_start'] == 9 * RATE
+    assert segments[1]['sample_end'] == 21 * RATE
+    assert segments[2]['sample_end'] == 30 * RATE
+
+
+def test_build_segments_rejects_negative_overlap():
+    with pytest.raises(ValueError):
+        audio_pipeline.build_segments(make_audio(5), [], overlap_seconds=-1)
+
+
+def test_merge_transcripts_trims_overlap_and_orders():
+    segments = [
+        {'index': 1, 'start': 60, 'end': 120, 'text': 'in the morning we met'},
+        {'index': 0, 'start': 0, 'end': 60, 'text': 'hello everyone. In the'},
+    ]
+    merged = audio_pipeline.merge_transcripts(segments)
+    assert merged.splitlines()[2] == '**[00:00:00 - 00:01:00]** hello everyone. In the'
+    assert '**[00:01:00 - 00:02:00]** morning we met' in merged
+
+
+def test_merge_transcripts_keeps_single_shared_word():
+    segments = [
+        {'index': 0, 'start': 0, 'end': 60, 'text': 'we looked at the'},
+        {'index': 1, 'start': 60, 'end': 120, 'text': 'the numbers'},
+    ]
+    assert '**[00:01:00 - 00:02:00]** the numbers' in audio_pipeline.merge_transcripts(segments)
+
+
+@pytest.mark.parametrize('previous, current, expected', [
+    ('大家好，今天我们开会', '我们开会讨论预算', '讨论预算'),
+    ('大家好，今天我们开会。', '我们开会，讨论预算', '讨论预算'),
+    ('这是我们的', '的确如此', '的确如此'),
+])
+def test_trim_overlap_cjk_characters(previous, current, expected):
+    assert audio_pipeline._trim_overlap(previous, current) == expected
+
+
+def test_merge_transcripts_trims_cjk_overlap():
+    segments = [
+        {'index': 0, 'start': 0, 'end': 60, 'text': '大家好，今天我们开会'},
+        {'index': 1, 'start': 60, 'end': 120, 'text': '我们开会讨论预算'},
+    ]
+    assert '**[00:01:00 - 00:02:00]** 讨论预算' in audio_pipeline.merge_transcripts(segments)
+
+
+def test_faster_whisper_backend_uses_num_workers(monkeypatch):
+    created = {}
+
+    class FakeWhisperModel:
+        def __init__(self, model_size, **kwargs):
+            created.update(kwargs, model_size=model_size)
+
+    monkeypatch.setitem(sys.modules, 'faster_whisper', types.SimpleNamespace(WhisperModel=FakeWhisperModel))
+    backend = audio_pipeline.get_backend('faster_whisper', num_workers=4)
+    assert backend.num_workers == 4
+    assert created['num_workers'] == 4
+
+
+def test_stub_backend_is_deterministic():
+    backend = audio_pipeline.get_backend('stub')
+    wav_bytes = make_audio(2).to_wav_bytes(0, 2 * RATE)
+    assert backend.transcribe(wav_bytes) == backend.transcribe(wav_bytes)
+    assert backend.transcribe(wav_bytes).startswith('[stub transcript: 2.0s')
+
+
+def test_transcribe_audio_with_stub_backend(tmp_path):
+    audio = make_audio(25, silent_seconds={9, 19})
+    path = tmp_path / 'meeting.wav'
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(audio.samples.tobytes())
+
+    progress = []
+    result = audio_pipeline.transcribe_audio(
+        str(path), audio_pipeline.get_backend('stub'), segment_seconds=10,
+        max_workers=2, progress_callback=lambda done, total, segment: progress.append((done, total))
+    )
+
+    assert [done for done, _ in progress] == [1, 2, 3]
+    assert all(total == 3 for _, total in progress)
+    assert result.startswith('### Audio Transcript:')
+    assert result.count('[stub transcript:') == 3
@@ -0,0 +1,36 @@
+"""上传文件签名验证测试"""
+import io
+
+import pytest
+
+
+@pytest.mark.parametrize('header', [
+    b'ID3\x03\x00\x00\x00\x00\x00\x00',  # ID3v2 标签
+    b'\xFF\xFB\x90\x00',  # MPEG-1 Layer III
+    b'\xFF\xFA\x90\x00',  # MPEG-1 Layer III（带 CRC）
+    b'\xFF\xF3\x90\x00',  # MPEG-2 Layer III
+    b'\xFF\xF2\x90\x00',  # MPEG-2 Layer III（带 CRC）
+    b'\xFF\xE3\x90\x00',  # MPEG-2.5 Layer III
+    b'\xFF\xE2\x90\x00',  # MPEG-2.5 Layer III（带 CRC）
+])
+def test_mp3_signatures(app_module, header):
+    assert app_module.initial_validation(io.BytesIO(header + b'\x00' * 64)) == 'mp3'
+
+
+@pytest.mark.parametrize('header', [
+    b'\xFF\xFD\x90\x00',  # Layer II
+    b'\xFF\xEB\x90\x00',  # 保留的 MPEG 版本
+    b'\xFF\xFB\xF0\x00',  # 无效比特率索引
+    b'\xFF\xFB\x9C\x00',  # 保留的采样率索引
+])
+def test_non_mp3_frame_headers_rejected(app_module, header):
+    assert app_module.initial_validation(io.BytesIO(header + b'\x00' * 64)) is None
+
+
+def test_wav_signature(app_module):
+    header = b'RIFF\x24\x00\x00\x00WAVEfmt '
+    assert app_module.initial_validation(io.BytesIO(header + b'\x00' * 64)) == 'wav'
+
+
+def test_jpeg_not_mistaken_for_mp3(app_module):
+    assert app_module.initial_validation(io.BytesIO(b'\xFF\xD8\xFF\xE0' + b'\x00' * 64)) == 'jpg'
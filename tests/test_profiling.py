@@ -0,0 +1,96 @@
+"""按需性能剖析测试"""
+import os
+import tracemalloc
+import uuid
+
+import pytest
+
+ADMIN_TOKEN = 'test-admin-token'
+
+
+@pytest.fixture
+def profiling_config(app_module, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'ADMIN_TOKEN', ADMIN_TOKEN)
+    monkeypatch.setitem(app_module.app.config, 'PROFILING_ALLOW_REQUEST', False)
+    monkeypatch.setitem(app_module.app.config, 'PROFILING_SAMPLE_RATE', 0.0)
+    return app_module.app.config
+
+
+def should_profile(app_module, headers=None, data=None):
+    with app_module.app.test_request_context('/upload', method='POST', headers=headers or {}, data=data or {}):
+        return app_module.should_profile_request()
+
+
+def test_admin_header_with_valid_token_enables_profiling(app_module, profiling_config):
+    assert should_profile(app_module, headers={'X-Admin-Token': ADMIN_TOKEN, 'X-Profile-Job': '1'})
+
+
+@pytest.mark.parametrize('headers', [
+    {'X-Profile-Job': '1'},
+    {'X-Profile-Job': '1', 'X-Admin-Token': 'wrong-token'},
+    {'X-Admin-Token': ADMIN_TOKEN},
+])
+def test_admin_header_requires_valid_token(app_module, profiling_config, headers):
+    assert not should_profile(app_module, headers=headers)
+
+
+def test_admin_header_ignored_when_admin_token_unset(app_module, profiling_config, monkeypatch):
+    monkeypatch.setitem(profiling_config, 'ADMIN_TOKEN', '')
+    assert not should_profile(app_module, headers={'X-Admin-Token': '', 'X-Profile-Job': '1'})
+
+
+def test_form_flag_requires_allow_request(app_module, profiling_config, monkeypatch):
+    assert not should_profile(app_module, data={'profile': '1'})
+    monkeypatch.setitem(profiling_config, 'PROFILING_ALLOW_REQUEST', True)
+    assert should_profile(app_module, data={'profile': '1'})
+
+
+def test_sample_rate(app_module, profiling_config, monkeypatch):
+    monkeypatch.setitem(profiling_config, 'PROFILING_SAMPLE_RATE', 1.0)
+    assert should_profile(app_module)
+
+
+@pytest.mark.parametrize('headers', [{}, {'X-Admin-Token': 'wrong-token'}])
+def test_admin_endpoints_hidden_without_token(client, profiling_config, headers):
+    unique_id = uuid.uuid4()
+    assert client.get(f'/admin/profile/{unique_id}', headers=headers).status_code == 404
+    assert client.get(f'/admin/profile/{unique_id}/conversion.prof', headers=headers).status_code == 404
+
+
+def test_profiling_session_disabled_writes_nothing(app_module):
+    unique_id = str(uuid.uuid4())
+    with app_module.profiling_session(unique_id, 'conversion', False):
+        pass
+    assert not os.path.exists(app_module.get_profile_artifact_path(unique_id, 'conversion', 'prof'))
+    assert not os.path.exists(app_module.get_profile_artifact_path(unique_id, 'conversion', 'alloc.txt'))
+
+
+def test_profiling_session_writes_artifacts(app_module, client, profiling_config):
+    unique_id = str(uuid.uuid4())
+    with app_module.profiling_session(unique_id, 'conversion', True):
+        retained = [bytearray(10000) for _ in range(100)]
+
+    assert not tracemalloc.is_tracing()
+    assert os.path.getsize(app_module.get_profile_artifact_path(unique_id, 'conversion', 'prof')) > 0
+    with open(app_module.get_profile_artifact_path(unique_id, 'conversion', 'alloc.txt'), encoding='utf-8') as f:
+        report = f.read()
+    assert report.startswith('Stage: conversion\n')
+    assert 'test_profiling.py' in report
+    assert len(retained) == 100
+
+    headers = {'X-Admin-Token': ADMIN_TOKEN}
+    listing = client.get(f'/admin/profile/{unique_id}', headers=headers)
+    assert listing.status_code == 200
+    assert [a['name'] for a in listing.json['artifacts']] == ['conversion.prof', 'conversion.alloc.txt']
+    download = client.get(f'/admin/profile/{unique_id}/conversion.alloc.txt', headers=headers)
+    assert download.status_code == 200
+    assert download.data.decode('utf-8') == report
+
+
+def test_profiling_session_skips_nested_session(app_module):
+    outer, inner = str(uuid.uuid4()), str(uuid.uuid4())
+    with app_module.profiling_session(outer, 'conversion', True):
+        with app_module.profiling_session(inner, 'validation', True):
+            pass
+    assert os.path.exists(app_module.get_profile_artifact_path(outer, 'conversion', 'alloc.txt'))
+    assert not os.path.exists(app_module.get_profile_artifact_path(inner, 'validation', 'alloc.txt'))
@@ -0,0 +1,84 @@
+"""Redis 地址解析、健康检查与任务分发回退测试（Redis 与 Celery 均为模拟对象）"""
+from unittest.mock import MagicMock
+
+import pytest
+from kombu.exceptions import OperationalError
+
+
+@pytest.mark.parametrize('env, expected', [
+    ({'REDIS_URL': 'rediss://:pw@redis:6380/2', 'CELERY_BROKER_URL': 'redis://broker:6379/0'},
+     'rediss://:pw@redis:6380/2'),
+    ({'CELERY_BROKER_URL': 'redis://:pw@broker:6379/1'}, 'redis://:pw@broker:6379/1'),
+    ({'REDIS_HOST': 'legacy', 'REDIS_PORT': '6390'}, 'redis://legacy:6390/0'),
+    ({'REDIS_HOST': 'legacy'}, 'redis://legacy:6379/0'),
+    ({}, None),
+])
+def test_get_redis_url(app_module, monkeypatch, env, expected):
+    for name in ('REDIS_URL', 'CELERY_BROKER_URL', 'REDIS_HOST', 'REDIS_PORT'):
+        monkeypatch.setenv(name, env.get(name, ''))
+    assert app_module.get_redis_url() == expected
+
+
+@pytest.fixture
+def dispatch_mocks(app_module, monkeypatch):
+    executor = MagicMock()
+    task = MagicMock()
+    monkeypatch.setattr(app_module, 'executor', executor)
+    monkeypatch.setattr(app_module, 'async_conversion_task', task, raising=False)
+    return executor, task
+
+
+def test_dispatch_uses_celery_when_healthy(app_module, monkeypatch, dispatch_mocks):
+    executor, task = dispatch_mocks
+    monkeypatch.setitem(app_module.redis_health, 'healthy', True)
+    app_module.dispatch_conversion('in.pdf', 'job', 'a.pdf', None, 'gpt-4o', False)
+    task.delay.assert_called_once_with('in.pdf', 'job')
+    executor.submit.assert_not_called()
+
+
+def test_dispatch_falls_back_to_executor_on_broker_error(app_module, monkeypatch, dispatch_mocks):
+    executor, task = dispatch_mocks
+    monkeypatch.setitem(app_module.redis_health, 'healthy', True)
+    task.delay.side_effect = OperationalError('broker unreachable')
+    app_module.dispatch_conversion('in.pdf', 'job', 'a.pdf', 'key', 'gpt-4o', True)
+    executor.submit.assert_called_once_with(
+        app_module.handle_conversion, 'in.pdf', 'job', 'a.pdf', 'key', 'gpt-4o', True
+    )
+
+
+def test_dispatch_uses_executor_when_unhealthy(app_module, monkeypatch, dispatch_mocks):
+    executor, task = dispatch_mocks
+    monkeypatch.setitem(app_module.redis_health, 'healthy', False)
+    app_module.dispatch_conversion('in.pdf', 'job', 'a.pdf', None, 'gpt-4o', False)
+    task.delay.assert_not_called()
+    executor.submit.assert_called_once()
+
+
+def test_check_redis_health_switches_cache_backend(app_module, monkeypatch):
+    pool = MagicMock()
+    monkeypatch.setattr(app_module, 'redis_pool', pool)
+    monkeypatch.setitem(app_module.CACHE_CONFIGS['redis'], 'CACHE_REDIS_HOST', MagicMock())
+    monkeypatch.setitem(app_module.redis_health, 'healthy', False)
+    try:
+        monkeypatch.setattr(app_module, 'is_redis_available', lambda: True)
+        app_module.check_redis_health()
+        assert app_module.redis_health['healthy'] is True
+        assert type(app_module.cache.cache).__name__ == 'RedisCache'
+        pool.disconnect.assert_not_called()
+
+        monkeypatch.setattr(app_module, 'is_redis_available', lambda: False)
+        app_module.check_redis_health()
+        assert app_module.redis_health['healthy'] is False
+        assert type(app_module.cache.cache).__name__ == 'SimpleCache'
+        pool.disconnect.assert_called_once()
+    finally:
+        app_module.cache.init_app(app_module.app, config=app_module.CACHE_CONFIGS['simple'])
+
+
+def test_check_redis_health_keeps_backend_when_unchanged(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'redis_pool', MagicMock())
+    monkeypatch.setattr(app_module, 'is_redis_available', lambda: False)
+    monkeypatch.setitem(app_module.redis_health, 'healthy', False)
+    cache_backend = app_module.cache.cache
+    app_module.check_redis_health()
+    assert app_module.cache.cache is cache_backend
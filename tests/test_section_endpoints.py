@@ -0,0 +1,78 @@
+"""章节读取接口测试"""
+import os
+import uuid
+
+import pytest
+
+DOCUMENT = "# A\n\nx\n\n## B\n\ny\n\n# C\n\nz\n".encode('utf-8')
+
+
+@pytest.fixture
+def job(app_module):
+    """在缓存中登记一个已完成的转换任务"""
+    unique_id = str(uuid.uuid4())
+    output_path = os.path.join(app_module.app.config['OUTPUT_FOLDER'], f"{unique_id}.md")
+    with open(output_path, 'wb') as f:
+        f.write(DOCUMENT)
+    app_module.section_index.write_section_index(output_path, DOCUMENT)
+    app_module.cache.set(unique_id, {'status': 'completed', 'path': output_path})
+    yield unique_id
+    app_module.cache.delete(unique_id)
+
+
+def test_outline(client, job):
+    response = client.get(f'/download/{job}/outline')
+    assert response.status_code == 200
+    assert [s['path'] for s in response.json['sections']] == [['A'], ['A', 'B'], ['C']]
+    assert response.json['size'] == len(DOCUMENT)
+
+
+@pytest.mark.parametrize('endpoint', ['outline', 'section?id=0', 'range'])
+def test_unknown_job_returns_404(client, endpoint):
+    assert client.get(f'/download/{uuid.uuid4()}/{endpoint}').status_code == 404
+
+
+@pytest.mark.parametrize('query, body', [
+    ('path=A/B', b'## B\n\ny\n\n'),
+    ('id=2', b'# C\n\nz\n'),
+])
+def test_section(client, job, query, body):
+    response = client.get(f'/download/{job}/section?{query}')
+    assert response.status_code == 200
+    assert response.data == body
+
+
+@pytest.mark.parametrize('query, status', [
+    ('', 400),
+    ('id=abc', 400),
+    ('id=%C2%B2', 400),  # '²'
+    ('id=', 400),
+    ('id=-1', 404),
+    ('id=3', 404),
+    ('path=A/missing', 404),
+])
+def test_section_invalid_requests(client, job, query, status):
+    assert client.get(f'/download/{job}/section?{query}').status_code == status
+
+
+def test_range(client, job):
+    response = client.get(f'/download/{job}/range?start=0&end=3')
+    assert response.status_code == 200
+    assert response.data == b'# A'
+    assert response.headers['X-Total-Size'] == str(len(DOCUMENT))
+
+
+def test_range_defaults_to_whole_file(client, job):
+    assert client.get(f'/download/{job}/range').data == DOCUMENT
+
+
+@pytest.mark.parametrize('query, status', [
+    ('start=x', 400),
+    ('end=1.5', 400),
+    ('start=', 400),
+    ('start=-1', 416),
+    (f'start={len(DOCUMENT) + 1}', 416),
+    ('start=5&end=2', 416),
+])
+def test_range_invalid_requests(client, job, query, status):
+    assert client.get(f'/download/{job}/range?{query}').status_code == status
@@ -0,0 +1,77 @@
+"""Markdown 标题索引测试"""
+import json
+
+import section_index
+
+DOCUMENT = (
+    "preamble\n"
+    "# 第一章\n"
+    "text é\n"
+    "## Intro ##\n"
+    "body\n"
+    "```\n"
+    "# not a heading\n"
+    "```\n"
+    "## Details\n"
+    "more\n"
+    "# Appendix\n"
+    "end\n"
+).encode('utf-8')
+
+
+def write_document(tmp_path):
+    path = tmp_path / 'doc.md'
+    path.write_bytes(DOCUMENT)
+    return str(path)
+
+
+def test_build_section_index_paths_and_ranges():
+    index = section_index.build_section_index(DOCUMENT)
+    assert [s['path'] for s in index['sections']] == [
+        ['第一章'], ['第一章', 'Intro'], ['第一章', 'Details'], ['Appendix']
+    ]
+    chapter, intro, details, appendix = index['sections']
+    assert chapter['end'] == appendix['start']
+    assert intro['end'] == details['start']
+    assert appendix['end'] == index['size'] == len(DOCUMENT)
+
+
+def test_section_bytes_include_fenced_code(tmp_path):
+    path = write_document(tmp_path)
+    index = section_index.write_section_index(path, DOCUMENT)
+    intro = section_index.find_section(index, '第一章/Intro')
+    data = section_index.read_byte_range(path, intro['start'], intro['end']).decode('utf-8')
+    assert data == "## Intro ##\nbody\n```\n# not a heading\n```\n"
+
+
+def test_write_section_index_replaces_atomically(tmp_path):
+    path = write_document(tmp_path)
+    section_index.write_section_index(path, DOCUMENT)
+    section_index.write_section_index(path, DOCUMENT)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['doc.index.json', 'doc.md']
+
+
+def test_load_section_index_rebuilds_stale_index(tmp_path):
+    path = write_document(tmp_path)
+    (tmp_path / 'doc.index.json').write_text(json.dumps({'version': 1, 'size': 0, 'sections': []}))
+    index = section_index.load_section_index(path)
+    assert len(index['sections']) == 4
+
+
+def section_paths(data):
+    return [s['path'] for s in section_index.build_section_index(data)['sections']]
+
+
+def test_fence_closes_only_on_matching_marker():
+    data = b"# A\n~~~\n```python\n# inside\n~~~\n# B\n"
+    assert section_paths(data) == [['A'], ['B']]
+
+
+def test_fence_close_requires_at_least_opening_length():
+    data = b"# A\n````\n```\n# inside\n````\n# B\n"
+    assert section_paths(data) == [['A'], ['B']]
+
+
+def test_indented_fence_marker_is_not_a_fence():
+    data = b"# A\n    ```\n# B\n## C\n"
+    assert section_paths(data) == [['A'], ['B'], ['B', 'C']]